@@ -3,34 +3,129 @@ import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
 import os
+import argparse
 import asyncio
 import json
 import logging
+import re
 import sqlite3
+import stat
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import threading
+import functools
+import bisect
+import importlib
+from collections import OrderedDict
 from statistics import mean
 
 # External imports
+# firebase_admin is imported by FirebaseManager only when credentials are present
 import telebot
-from telethon import TelegramClient, functions, types, errors
-from telethon.errors import ChannelPrivateError, UsernameNotOccupiedError
-import firebase_admin
-from firebase_admin import credentials, firestore
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+# Optional fast JSON decoder; the stdlib parser accepts the same bytes input
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Log messages use %-style arguments so they are only formatted when the level is enabled
+LOG_LEVEL = (os.getenv('LOG_LEVEL') or 'INFO').upper()
+# getLevelName maps known names to their number; an unknown name would make basicConfig raise
+_LOG_LEVEL_KNOWN = isinstance(logging.getLevelName(LOG_LEVEL), int)
+logging.basicConfig(
+    level=LOG_LEVEL if _LOG_LEVEL_KNOWN else logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    force=True
+)
 logger = logging.getLogger(__name__)
+if not _LOG_LEVEL_KNOWN:
+    logger.warning("Unknown LOG_LEVEL %r, falling back to INFO", LOG_LEVEL)
+
+def create_http_session() -> requests.Session:
+    """Create a pooled keep-alive HTTP session shared by the API clients"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=100)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call in the default executor so the event loop keeps serving other requests"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def http_get(session: requests.Session, url: str, **kwargs) -> requests.Response:
+    """Non-blocking wrapper around session.get"""
+    return await run_blocking(session.get, url, **kwargs)
+
+def parse_iso_datetime(value: str) -> datetime:
+    """Parse an ISO-8601 timestamp (a trailing 'Z' included) with the C-level fromisoformat"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def naive_datetime(value: datetime) -> datetime:
+    """Drop tzinfo so API timestamps compare with the naive datetime.now()"""
+    return value.replace(tzinfo=None) if value.tzinfo is not None else value
+
+def firebase_credentials_problem(path: str) -> Optional[str]:
+    """Explain why the Firebase credentials file is unusable, or return None if it is a regular file"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "Firebase credentials not found"
+    except PermissionError as e:
+        return f"Firebase credentials unreadable: {e}"
+    except OSError as e:
+        return f"Firebase credentials unavailable: {e}"
+    if not stat.S_ISREG(st.st_mode):
+        return "Firebase credentials path is not a regular file"
+    return None
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL (seconds)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
 
 # Configuration
 @dataclass
@@ -69,6 +164,14 @@ class Config:
         
         return missing
 
+# harvester.py lives next to its stats.db; make it importable once, at startup
+HARVESTER_DIR = os.path.dirname(Config.HARVESTER_DB_PATH)
+if HARVESTER_DIR and HARVESTER_DIR not in sys.path:
+    sys.path.insert(0, HARVESTER_DIR)
+
+# Slotted dataclasses drop the per-instance __dict__ (available from Python 3.10)
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 class ChannelNiche(Enum):
     CRYPTO = "crypto"
     TECH = "tech"
@@ -80,7 +183,13 @@ class ChannelNiche(Enum):
     EDUCATION = "education"
     LIFESTYLE = "lifestyle"
 
-@dataclass
+    def __init__(self, value):
+        # Declaration order, used to index per-niche lookup tuples
+        self.ordinal = len(type(self).__members__)
+
+NICHE_BY_VALUE = {niche.value: niche for niche in ChannelNiche}
+
+@dataclass(**DATACLASS_SLOTS)
 class ChannelMetrics:
     username: str
     title: str
@@ -101,14 +210,14 @@ class ChannelMetrics:
     media_ratio: float = 0.0
     posts_per_day: float = 0.0
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class EligibilityResult:
     eligible: bool
     reasons: List[str]
     warnings: List[str]
     confidence: float
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class CPMRecommendation:
     conservative: float
     competitive: float
@@ -119,52 +228,161 @@ class CPMRecommendation:
 
 # Firebase Database Manager
 class FirebaseManager:
+    FLUSH_BATCH_SIZE = 100  # Firestore allows up to 500 writes per batch
+    FLUSH_INTERVAL = 0.5  # seconds to wait for more writes before committing
+
     def __init__(self, credentials_path: str):
+        self._queue = None
+        self._flusher = None
+        self._firestore = None
         try:
-            if os.path.exists(credentials_path):
+            # Same check main() reports at startup, so the two never disagree
+            problem = firebase_credentials_problem(credentials_path)
+            if problem is None:
+                # Deferred so deployments without persistence never load the Firebase SDK
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                self._firestore = firestore
                 cred = credentials.Certificate(credentials_path)
                 if not firebase_admin._apps:
                     firebase_admin.initialize_app(cred)
                 self.db = firestore.client()
                 logger.info("Firebase initialized successfully")
             else:
-                logger.warning(f"Firebase credentials not found at {credentials_path}")
+                logger.warning("%s (%s) - running without data persistence", problem, credentials_path)
                 self.db = None
         except Exception as e:
-            logger.error(f"Firebase initialization failed: {e}")
+            logger.error("Firebase initialization failed: %s", e)
             self.db = None
 
-    async def save_channel_analysis(self, channel_data: Dict):
+    def queue_channel_analysis(self, channel_data: Dict) -> bool:
+        """Queue an analysis for the background batch writer; must be called on the event loop"""
         if not self.db:
             return False
-        try:
-            doc_ref = self.db.collection('channel_analyses').document(channel_data['username'])
-            doc_ref.set({
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_queue())
+        self._queue.put_nowait((channel_data, datetime.now()))
+        return True
+
+    async def close(self):
+        """Commit everything still queued and stop the background writer"""
+        if self._queue is None:
+            return
+        # None is the shutdown sentinel; it lands behind every pending analysis
+        self._queue.put_nowait(None)
+        await self._flusher
+
+    def pending_count(self) -> int:
+        """Analyses queued but not yet handed to a Firestore batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _flush_queue(self):
+        """Commit queued analyses in batches of up to FLUSH_BATCH_SIZE or every FLUSH_INTERVAL seconds"""
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while len(items) < self.FLUSH_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                items.append(item)
+            try:
+                await run_blocking(self._commit_batch, items)
+            except Exception as e:
+                logger.error("Failed to save %s channel analyses: %s", len(items), e)
+
+    def _commit_batch(self, items: List[Tuple[Dict, datetime]]):
+        """Write queued analyses in one Firestore batch, merging repeats of the same channel"""
+        merged = {}
+        for channel_data, analyzed_at in items:
+            username = channel_data['username']
+            count = merged[username][2] + 1 if username in merged else 1
+            merged[username] = (channel_data, analyzed_at, count)
+        
+        batch = self.db.batch()
+        for username, (channel_data, analyzed_at, count) in merged.items():
+            doc_ref = self.db.collection('channel_analyses').document(username)
+            batch.set(doc_ref, {
                 **channel_data,
-                'analyzed_at': datetime.now(),
-                'analysis_count': firestore.Increment(1)
+                'analyzed_at': analyzed_at,
+                'analysis_count': self._firestore.Increment(count)
             }, merge=True)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to save channel analysis: {e}")
-            return False
+        batch.commit()
 
 # Enhanced Harvester Integration Class with Bot API
 class TelegramHarvester:
     """Integrates with harvester.py's SQLite cache + Bot API for comprehensive channel data"""
     REFRESH_CACHE = 6 * 3600  # 6 hours
-
-    def __init__(self, api_id: int, api_hash: str, db_path: str, bot_token: str = ""):
+    # Per-connection settings for the bot's read path; none of them write to stats.db.
+    # The WAL settings (journal_mode=WAL, wal_autocheckpoint) belong to the writer,
+    # harvester.py (see README); the bot only attempts the WAL switch
+    DB_PRAGMAS = """
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        PRAGMA cache_size=-32000;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+    """
+    CACHE_COLUMNS = '''handle, title, description, subs, avg_views,
+                       posts_per_day, total_forwards, total_reactions,
+                       media_ratio, is_verified, updated'''
+    # Kept as one constant so sqlite3's statement cache reuses the parsed query
+    CACHE_SELECT_SQL = f"SELECT {CACHE_COLUMNS} FROM channel_stats WHERE handle=?"
+
+    def __init__(self, api_id: int, api_hash: str, db_path: str, bot_token: str = "",
+                 http: Optional[requests.Session] = None):
         self.api_id = api_id
         self.api_hash = api_hash
         self.db_path = db_path
         self.bot_token = bot_token
+        self.http = http or create_http_session()
         self.log = logging.getLogger(__name__)
         self.db = None
+        self._tls = threading.local()
+        self._fetch_fresh = self._load_harvester_fetcher()
+
+    def _load_harvester_fetcher(self):
+        """Import harvester.py once and return its async get_stats, or None if unavailable"""
+        try:
+            return importlib.import_module('harvester').get_stats
+        except Exception as e:
+            self.log.warning("harvester.py not available, using cached stats only: %s", e)
+            return None
 
     def _get_db_connection(self):
-        """Get a fresh database connection for this thread"""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's long-lived database connection, opening it on first use"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   isolation_level=None, cached_statements=256)
+            try:
+                # Switching to WAL rewrites the file header, so it needs write access;
+                # a read-only stats.db keeps its journal mode and stays readable
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError as e:
+                self.log.warning("Could not switch %s to WAL, keeping its journal mode: %s", self.db_path, e)
+            try:
+                conn.executescript(self.DB_PRAGMAS)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            conn.row_factory = sqlite3.Row
+            # Cached only once fully set up, so a failed setup is retried on the next call
+            self._tls.conn = conn
+        return conn
 
     async def _get_bot_api_info(self, handle: str) -> Optional[Dict]:
         """Get basic channel info using Bot API (verification + description)"""
@@ -176,10 +394,10 @@ class TelegramHarvester:
             url = f"https://api.telegram.org/bot{self.bot_token}/getChat"
             params = {"chat_id": f"@{handle}"}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = await http_get(self.http, url, params=params, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 if data.get('ok'):
                     chat = data['result']
                     return {
@@ -189,81 +407,63 @@ class TelegramHarvester:
                         'username': chat.get('username', handle)
                     }
             else:
-                self.log.warning(f"Bot API failed for @{handle}: {response.status_code}")
+                self.log.warning("Bot API failed for @%s: %s", handle, response.status_code)
                 
         except Exception as e:
-            self.log.error(f"Bot API error for @{handle}: {e}")
+            self.log.error("Bot API error for @%s: %s", handle, e)
         
         return None
 
-    def load_from_cache(self, handle: str):
+    async def load_from_cache(self, handle: str) -> Optional[Dict]:
+        """Load one channel's cached stats without blocking the event loop"""
+        return await run_blocking(self._load_from_cache_sync, handle)
+
+    def _load_from_cache_sync(self, handle: str) -> Optional[Dict]:
         try:
             handle = handle.lstrip('@')
             db = self._get_db_connection()
             
-            # Use column names instead of position mapping
-            row = db.execute('''SELECT handle, title, description, subs, avg_views, 
-                                    posts_per_day, total_forwards, total_reactions, 
-                                    media_ratio, is_verified, updated 
-                                FROM channel_stats WHERE handle=?''', (handle,)).fetchone()
-            db.close()
+            row = db.execute(self.CACHE_SELECT_SQL, (handle,)).fetchone()
             
             if not row:
                 return None
             
-            data = {
-                'handle': row[0],
-                'title': row[1], 
-                'description': row[2],
-                'subs': row[3],
-                'avg_views': row[4],
-                'posts_per_day': row[5],
-                'total_forwards': row[6],
-                'total_reactions': row[7],
-                'media_ratio': row[8],
-                'is_verified': bool(row[9]),
-                'updated': row[10]
-            }
-            data['username'] = data['handle']
-            
-            return data
+            return self._row_to_dict(row)
         
         except Exception as e:
-            self.log.error(f"Failed to load harvester cache for {handle}: {e}")
+            self.log.error("Failed to load harvester cache for %s: %s", handle, e)
             return None
 
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        """Map a channel_stats row to the harvester stats dict"""
+        data = dict(row)
+        data['is_verified'] = bool(data['is_verified'])
+        data['username'] = data['handle']
+        return data
+
     async def get_stats(self, handle: str):
         """Get channel stats from harvester cache + Bot API for verification"""
         handle = handle.lstrip('@')
         
         # Step 1: Get analytics data from harvester cache
-        cached = self.load_from_cache(handle)
+        cached = await self.load_from_cache(handle)
         now = time.time()
         
         # Step 2: Get fresh harvester data if cache is stale
         harvester_data = None
-        if not cached or now - cached.get('updated', 0) > self.REFRESH_CACHE:
+        if self._fetch_fresh and (not cached or now - cached.get('updated', 0) > self.REFRESH_CACHE):
             try:
-                import sys
-                import os
-                
-                # Add harvester directory to path
-                harvester_dir = os.path.dirname(self.db_path)
-                if harvester_dir not in sys.path:
-                    sys.path.insert(0, harvester_dir)
-                
-                import importlib
-                harvester = importlib.import_module('harvester')
-                self.log.info(f"Fetching fresh harvester data for {handle}")
-                harvester_data = await harvester.get_stats(handle)
+                self.log.info("Fetching fresh harvester data for %s", handle)
+                harvester_data = await self._fetch_fresh(handle)
             except Exception as e:
-                self.log.error(f"Failed to fetch fresh harvester data for {handle}: {e}")
+                self.log.error("Failed to fetch fresh harvester data for %s: %s", handle, e)
         
         # Use fresh data if available, otherwise cached
         analytics_data = harvester_data if harvester_data else cached
         
         if not analytics_data:
-            self.log.warning(f"No harvester data available for @{handle}")
+            self.log.warning("No harvester data available for @%s", handle)
             return None
 
         # Step 3: Get real verification status and description from Bot API
@@ -273,7 +473,7 @@ class TelegramHarvester:
         final_data = analytics_data.copy()
         
         if bot_api_data:
-            self.log.info(f"Merging Bot API data for @{handle}")
+            self.log.info("Merging Bot API data for @%s", handle)
             # Override with real Bot API data
             final_data['is_verified'] = bot_api_data['is_verified']
             final_data['description'] = bot_api_data['description']
@@ -285,12 +485,66 @@ class TelegramHarvester:
         
         return final_data
 
+def compile_niche_patterns(keywords: Dict[ChannelNiche, Tuple[str, ...]]) -> Tuple[re.Pattern, Tuple[ChannelNiche, ...]]:
+    """Fold every keyword into one pattern with a capture group per niche, in niche priority order.
+
+    The alternation sits inside a lookahead so matches may overlap: each
+    position reports the highest-priority niche with a keyword starting there.
+    """
+    groups = '|'.join(f"({'|'.join(map(re.escape, niche_keywords))})" for niche_keywords in keywords.values())
+    return re.compile(f"(?={groups})"), tuple(keywords)
+
+@functools.lru_cache(maxsize=1024)
+def match_niche(title: str, description: str,
+                patterns: Tuple[re.Pattern, Tuple[ChannelNiche, ...]]) -> ChannelNiche:
+    """Return the highest-priority niche with a keyword in the channel text.
+
+    Memoized on the raw title/description, so re-analyzed channels skip
+    both the lowercased copy and the regex scan.
+    """
+    pattern, niches = patterns
+    text = f"{title} {description}".lower()
+    best = None
+    for match in pattern.finditer(text):
+        group = match.lastindex
+        if group == 1:
+            return niches[0]
+        if best is None or group < best:
+            best = group
+    return niches[best - 1] if best is not None else ChannelNiche.ENTERTAINMENT
+
+# Enhanced keywords including Russian/Ukrainian terms
+TGSTAT_NICHE_KEYWORDS = {
+    ChannelNiche.CRYPTO: ('crypto', 'bitcoin', 'blockchain', 'defi', 'nft', 'trading', 'btc', 'eth'),
+    ChannelNiche.TECH: ('tech', 'technology', 'programming', 'ai', 'software'),
+    ChannelNiche.BUSINESS: ('business', 'entrepreneur', 'startup', 'marketing'),
+    ChannelNiche.FINANCE: ('finance', 'investment', 'stock', 'forex', 'money'),
+    ChannelNiche.NEWS: ('news', 'breaking', 'daily', 'update'),
+    ChannelNiche.GAMING: ('gaming', 'game', 'esports', 'gamer'),
+    ChannelNiche.EDUCATION: ('education', 'learning', 'course', 'tutorial'),
+    ChannelNiche.ENTERTAINMENT: ('entertainment', 'fun', 'meme', 'funny'),
+}
+TGSTAT_NICHE_PATTERNS = compile_niche_patterns(TGSTAT_NICHE_KEYWORDS)
+
+NICHE_KEYWORDS = {
+    ChannelNiche.CRYPTO: ('crypto', 'bitcoin', 'blockchain', 'defi', 'nft', 'trading', 'altcoin'),
+    ChannelNiche.TECH: ('tech', 'technology', 'programming', 'ai', 'software', 'developer'),
+    ChannelNiche.BUSINESS: ('business', 'entrepreneur', 'startup', 'marketing', 'sales'),
+    ChannelNiche.FINANCE: ('finance', 'investment', 'stock', 'forex', 'money'),
+    ChannelNiche.NEWS: ('news', 'breaking', 'daily', 'update', 'current'),
+    ChannelNiche.GAMING: ('gaming', 'game', 'esports', 'gamer'),
+    ChannelNiche.EDUCATION: ('education', 'learning', 'course', 'tutorial'),
+    ChannelNiche.ENTERTAINMENT: ('entertainment', 'fun', 'meme', 'funny'),
+}
+NICHE_PATTERNS = compile_niche_patterns(NICHE_KEYWORDS)
+
 # TGStat API Integration
 class TGStatAnalyzer:
     """TGStat.com API integration for comprehensive channel data"""
     
-    def __init__(self, api_token: str = ""):
+    def __init__(self, api_token: str = "", http: Optional[requests.Session] = None):
         self.api_token = api_token
+        self.http = http or create_http_session()
         self.base_url = "https://api.tgstat.ru"
         self.headers = {
             'User-Agent': 'TelegramCPMBot/1.0',
@@ -305,7 +559,8 @@ class TGStatAnalyzer:
         
         try:
             # Get channel info from TGStat
-            info_response = requests.get(
+            info_response = await http_get(
+                self.http,
                 f"{self.base_url}/channels/get",
                 params={'channelId': f'@{username}'},
                 headers=self.headers,
@@ -313,27 +568,28 @@ class TGStatAnalyzer:
             )
             
             if info_response.status_code == 200:
-                info_data = info_response.json()
+                info_data = json_loads(info_response.content)
                 if info_data.get('ok'):
                     result = info_data.get('result', {})
-                    logger.info(f"TGStat data retrieved for @{username}")
+                    logger.info("TGStat data retrieved for @%s", username)
                     return result
                 else:
-                    logger.warning(f"TGStat API error: {info_data.get('description', 'Unknown error')}")
+                    logger.warning("TGStat API error: %s", info_data.get('description', 'Unknown error'))
                     return None
             elif info_response.status_code == 404:
-                logger.warning(f"Channel @{username} not found in TGStat")
+                logger.warning("Channel @%s not found in TGStat", username)
                 return None
             else:
-                logger.warning(f"TGStat API returned status {info_response.status_code}")
+                logger.warning("TGStat API returned status %s", info_response.status_code)
                 return None
             
         except Exception as e:
-            logger.error(f"TGStat request failed for @{username}: {e}")
+            logger.error("TGStat request failed for @%s: %s", username, e)
             return None
     
-    def process_tgstat_data(self, username: str, data: Dict) -> Optional[ChannelMetrics]:
+    def process_tgstat_data(self, username: str, data: Dict, now: Optional[datetime] = None) -> Optional[ChannelMetrics]:
         """Convert TGStat data to ChannelMetrics format"""
+        now = now or datetime.now()
         try:
             # Extract basic info
             title = data.get('title', username)
@@ -354,18 +610,18 @@ class TGStatAnalyzer:
             # Estimate activity level
             if 'postsCount' in data and 'createdAt' in data:
                 try:
-                    created_date = datetime.fromisoformat(data['createdAt'].replace('Z', '+00:00'))
-                    days_active = (datetime.now().replace(tzinfo=created_date.tzinfo) - created_date).days
+                    created_date = parse_iso_datetime(data['createdAt'])
+                    days_active = (now.replace(tzinfo=created_date.tzinfo) - created_date).days
                     if days_active > 0:
                         posts_per_day = data['postsCount'] / days_active
                 except:
                     posts_per_day = 0.5  # Default estimate
             
             # Set reasonable defaults for missing data
-            last_post_date = datetime.now() - timedelta(days=1)
+            last_post_date = now - timedelta(days=1)
             if 'lastPostDate' in data:
                 try:
-                    last_post_date = datetime.fromisoformat(data['lastPostDate'].replace('Z', '+00:00'))
+                    last_post_date = parse_iso_datetime(data['lastPostDate'])
                     last_post_date = last_post_date.replace(tzinfo=None)
                 except:
                     pass
@@ -374,7 +630,7 @@ class TGStatAnalyzer:
             niche = self._classify_niche_tgstat(title, description)
             
             # Calculate content quality score
-            content_quality = self._assess_tgstat_quality(data, subscribers, engagement_rate)
+            content_quality = self._assess_tgstat_quality(data, subscribers, engagement_rate, now)
             
             return ChannelMetrics(
                 username=username,
@@ -397,32 +653,15 @@ class TGStatAnalyzer:
             )
             
         except Exception as e:
-            logger.error(f"Error processing TGStat data for @{username}: {e}")
+            logger.error("Error processing TGStat data for @%s: %s", username, e)
             return None
     
     def _classify_niche_tgstat(self, title: str, description: str) -> ChannelNiche:
         """Classify niche for TGStat data"""
-        text = (title + ' ' + description).lower()
-        
-        # Enhanced keywords including Russian/Ukrainian terms
-        keywords = {
-            ChannelNiche.CRYPTO: ['crypto', 'bitcoin', 'blockchain', 'defi', 'nft', 'trading', 'btc', 'eth'],
-            ChannelNiche.TECH: ['tech', 'technology', 'programming', 'ai', 'software'],
-            ChannelNiche.BUSINESS: ['business', 'entrepreneur', 'startup', 'marketing'],
-            ChannelNiche.FINANCE: ['finance', 'investment', 'stock', 'forex', 'money'],
-            ChannelNiche.NEWS: ['news', 'breaking', 'daily', 'update'],
-            ChannelNiche.GAMING: ['gaming', 'game', 'esports', 'gamer'],
-            ChannelNiche.EDUCATION: ['education', 'learning', 'course', 'tutorial'],
-            ChannelNiche.ENTERTAINMENT: ['entertainment', 'fun', 'meme', 'funny'],
-        }
-        
-        for niche, niche_keywords in keywords.items():
-            if any(keyword in text for keyword in niche_keywords):
-                return niche
-        
-        return ChannelNiche.ENTERTAINMENT
+        return match_niche(title, description, TGSTAT_NICHE_PATTERNS)
     
-    def _assess_tgstat_quality(self, data: Dict, subscribers: int, engagement_rate: float) -> float:
+    def _assess_tgstat_quality(self, data: Dict, subscribers: int, engagement_rate: float,
+                               now: Optional[datetime] = None) -> float:
         """Assess content quality from TGStat data"""
         score = 0.5  # Base score
         
@@ -453,8 +692,8 @@ class TGStatAnalyzer:
         # Channel age/maturity
         if 'createdAt' in data:
             try:
-                created_date = datetime.fromisoformat(data['createdAt'].replace('Z', '+00:00'))
-                age_days = (datetime.now().replace(tzinfo=created_date.tzinfo) - created_date).days
+                created_date = parse_iso_datetime(data['createdAt'])
+                age_days = ((now or datetime.now()).replace(tzinfo=created_date.tzinfo) - created_date).days
                 if age_days > 365:  # Over 1 year old
                     score += 0.1
             except:
@@ -464,9 +703,25 @@ class TGStatAnalyzer:
 
 # Enhanced Channel Analyzer with Harvester Integration + TGStat
 class ChannelAnalyzer:
+    ANALYSIS_CACHE_SIZE = 4096
+    ANALYSIS_CACHE_TTL = 600  # 10 minutes
+    SOURCE_HEDGE_DELAY = 1.5  # seconds a source may stall before the next one is started too
+    SUBSCRIBER_FIELDS = (
+        'participants_count', 'subscribers_count', 'member_count', 
+        'subscribers', 'members', 'participants', 'count', 'subs',
+        'participantsCount', 'subscribersCount', 'memberCount'
+    )
+
     def __init__(self, config: Config):
         self.config = config
         
+        # Recent analyses plus in-flight lookups, so repeated requests skip the network
+        self._analysis_cache = TTLCache(self.ANALYSIS_CACHE_SIZE, self.ANALYSIS_CACHE_TTL)
+        self._inflight = {}
+        
+        # Shared keep-alive session for every outbound API call
+        self.http = create_http_session()
+        
         # Initialize Telemetr.io
         self.telemetrio_headers = {
             'accept': 'application/json',
@@ -476,8 +731,8 @@ class ChannelAnalyzer:
         self.telemetrio_base_url = "https://api.telemetr.io/v1"
         
         # Initialize TGStat
-        self.tgstat = TGStatAnalyzer(config.TGSTAT_API_TOKEN)
-        logger.info(f"TGStat initialized with token: {'Yes' if config.TGSTAT_API_TOKEN else 'No'}")
+        self.tgstat = TGStatAnalyzer(config.TGSTAT_API_TOKEN, self.http)
+        logger.info("TGStat initialized with token: %s", 'Yes' if config.TGSTAT_API_TOKEN else 'No')
         
         # Initialize Harvester with Bot API integration
         self.harvester = None
@@ -486,68 +741,157 @@ class ChannelAnalyzer:
                 config.HARVESTER_API_ID, 
                 config.HARVESTER_API_HASH,
                 config.HARVESTER_DB_PATH,
-                config.BOT_TOKEN  # Pass bot token for Bot API integration
+                config.BOT_TOKEN,  # Pass bot token for Bot API integration
+                self.http
             )
             logger.info("Harvester initialized with Bot API integration")
         else:
             logger.warning("Harvester not initialized - missing TG_API_ID or TG_API_HASH")
 
     async def analyze_channel(self, username: str) -> Optional[ChannelMetrics]:
+        """Analyze a channel, serving recent results from memory and
+        coalescing concurrent lookups of the same channel into one fetch"""
+        username = username.lstrip('@')
+        # Telegram usernames are case-insensitive, so @Durov and @durov share one entry;
+        # the sources are still queried with the caller's spelling
+        key = username.lower()
+
+        cached = self._analysis_cache.get(key)
+        if cached is not None:
+            logger.info("Using cached analysis for @%s", username)
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._analyze_and_cache(username, key))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _analyze_and_cache(self, username: str, key: str) -> Optional[ChannelMetrics]:
+        """Run the source lookup once, caching a successful result under key"""
+        try:
+            metrics = await self._analyze_channel_sources(username)
+            if metrics:
+                # Normalize once at ingest so downstream date math can assume naive datetimes
+                metrics.last_post_date = naive_datetime(metrics.last_post_date)
+                self._analysis_cache[key] = metrics
+            return metrics
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _analyze_channel_sources(self, username: str) -> Optional[ChannelMetrics]:
         """
         Enhanced multi-source channel analysis:
+        0) Fresh, complete harvester cache row (no network)
         1) Telemetr.io (premium analytics)
         2) Harvester (local cache + Bot API)  
         3) TGStat (comprehensive fallback)
         """
-        username = username.lstrip('@')
-
-        # Step 1: Try Telemetr.io first
-        telemetrio_data = await self._get_telemetrio_data(username)
-        if telemetrio_data:
-            logger.info(f"Using Telemetr.io data for @{username}")
-            metrics = self._process_telemetrio_data(username, telemetrio_data)
-
-            # Merge with harvester data if needed
-            if self.harvester:
-                needs_desc = not metrics.description or not metrics.description.strip()
-                needs_posts = metrics.posts_per_day == 0.0
-                needs_inter = (metrics.total_reactions == 0 and
-                               metrics.total_forwards == 0 and
-                               metrics.media_ratio == 0.0)
-
-                if needs_desc or needs_posts or needs_inter:
-                    harv = await self.harvester.get_stats(username)
-                    if harv:
-                        if needs_desc and harv.get("description"):
-                            metrics.description = harv["description"]
-                        if needs_posts and harv.get("posts_per_day") is not None:
-                            metrics.posts_per_day = harv["posts_per_day"]
-                        if needs_inter:
-                            metrics.total_reactions = harv.get("total_reactions", 0)
-                            metrics.total_forwards = harv.get("total_forwards", 0)
-                            metrics.media_ratio = harv.get("media_ratio", 0.0)
-                        if harv.get("is_verified") is not None:
-                            metrics.is_verified = harv["is_verified"]
-            return metrics
+        # One clock read shared by every date computation in this analysis
+        now = datetime.now()
 
-        # Step 2: Try Harvester
+        # Step 0: Serve straight from the harvester cache when it is recent and complete
+        if self.harvester:
+            cached = await self.harvester.load_from_cache(username)
+            if (cached
+                    and time.time() - (cached.get('updated') or 0) < self.harvester.REFRESH_CACHE
+                    and cached.get('description')
+                    and cached.get('posts_per_day')):
+                logger.info("Using fresh harvester cache for @%s", username)
+                return self._process_harvester_data(cached, now)
+
+        # Sources are consumed in priority order and each one is started only when it is
+        # needed: when everything ahead of it failed, or as a hedge once the source ahead
+        # has stalled for SOURCE_HEDGE_DELAY. Lookups cost API quota, so none run speculatively.
+        sources = {
+            'Telemetr.io': lambda: self._get_telemetrio_data(username),
+            'TGStat': lambda: self.tgstat.get_channel_data(username),
+        }
         if self.harvester:
-            logger.info(f"Trying harvester for @{username}")
-            harvester_data = await self.harvester.get_stats(username)
+            sources['Harvester'] = lambda: self.harvester.get_stats(username)
+        tasks = {}
+
+        def start(source: str):
+            if source in sources and source not in tasks:
+                tasks[source] = asyncio.ensure_future(sources[source]())
+
+        start('Telemetr.io')
+        try:
+            # Step 1: Prefer Telemetr.io
+            backup = 'Harvester' if self.harvester else 'TGStat'
+            telemetrio_data = await self._source_result(username, tasks, 'Telemetr.io',
+                                                        hedge=lambda: start(backup))
+            if telemetrio_data:
+                logger.info("Using Telemetr.io data for @%s", username)
+                metrics = self._process_telemetrio_data(username, telemetrio_data, now)
+
+                # Merge with harvester data if needed
+                if self.harvester:
+                    needs_desc = not metrics.description or not metrics.description.strip()
+                    needs_posts = metrics.posts_per_day == 0.0
+                    needs_inter = (metrics.total_reactions == 0 and
+                                   metrics.total_forwards == 0 and
+                                   metrics.media_ratio == 0.0)
+
+                    if needs_desc or needs_posts or needs_inter:
+                        start('Harvester')
+                        harv = await self._source_result(username, tasks, 'Harvester')
+                        if harv:
+                            if needs_desc and harv.get("description"):
+                                metrics.description = harv["description"]
+                            if needs_posts and harv.get("posts_per_day") is not None:
+                                metrics.posts_per_day = harv["posts_per_day"]
+                            if needs_inter:
+                                metrics.total_reactions = harv.get("total_reactions", 0)
+                                metrics.total_forwards = harv.get("total_forwards", 0)
+                                metrics.media_ratio = harv.get("media_ratio", 0.0)
+                            if harv.get("is_verified") is not None:
+                                metrics.is_verified = harv["is_verified"]
+                return metrics
+
+            # Step 2: Harvester
+            start('Harvester')
+            harvester_data = await self._source_result(username, tasks, 'Harvester',
+                                                       hedge=lambda: start('TGStat'))
             if harvester_data:
-                logger.info(f"Using Harvester data for @{username}")
-                return self._process_harvester_data(harvester_data)
-
-        # Step 3: Try TGStat as final fallback
-        logger.info(f"Trying TGStat for @{username}")
-        tgstat_data = await self.tgstat.get_channel_data(username)
-        if tgstat_data:
-            logger.info(f"Using TGStat data for @{username}")
-            return self.tgstat.process_tgstat_data(username, tgstat_data)
-
-        # No data source worked
-        logger.error(f"No data source available for @{username}")
-        return None
+                logger.info("Using Harvester data for @%s", username)
+                return self._process_harvester_data(harvester_data, now)
+
+            # Step 3: TGStat as final fallback
+            start('TGStat')
+            tgstat_data = await self._source_result(username, tasks, 'TGStat')
+            if tgstat_data:
+                logger.info("Using TGStat data for @%s", username)
+                return self.tgstat.process_tgstat_data(username, tgstat_data, now)
+
+            # No data source worked
+            logger.error("No data source available for @%s", username)
+            return None
+        finally:
+            # Drops hedged lookups that lost; a request already handed to the
+            # executor still completes in its thread, only its result is discarded
+            for task in tasks.values():
+                task.cancel()
+
+    async def _source_result(self, username: str, tasks: Dict[str, asyncio.Future], source: str,
+                             hedge: Optional[Callable[[], None]] = None) -> Optional[Dict]:
+        """Await one source's lookup, treating a missing source or a failure as no data.
+
+        If the lookup is still pending after SOURCE_HEDGE_DELAY, `hedge` is
+        called once to start the next source alongside it.
+        """
+        task = tasks.get(source)
+        if task is None:
+            return None
+        try:
+            if hedge is not None:
+                done, _ = await asyncio.wait({task}, timeout=self.SOURCE_HEDGE_DELAY)
+                if not done:
+                    hedge()
+            return await task
+        except Exception as e:
+            logger.error("%s lookup failed for @%s: %s", source, username, e)
+            return None
 
     async def _get_telemetrio_data(self, username: str) -> Optional[Dict]:
         """Get channel data from Telemetr.io"""
@@ -562,36 +906,47 @@ class ChannelAnalyzer:
             
             combined_data = {}
             
-            for endpoint in endpoints:
-                try:
-                    response = requests.get(
-                        endpoint,
-                        headers=self.telemetrio_headers,
-                        params={"handle": username},
-                        timeout=10
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        combined_data.update(data)
-                        logger.info(f"Telemetr.io {endpoint.split('/')[-1]} success for @{username}")
-                    elif response.status_code == 404:
-                        logger.warning(f"Channel @{username} not in Telemetr.io account")
+            # Fetch both endpoints concurrently, then merge in endpoint order
+            responses = await asyncio.gather(*(
+                http_get(
+                    self.http,
+                    endpoint,
+                    headers=self.telemetrio_headers,
+                    params={"handle": username},
+                    timeout=10
+                )
+                for endpoint in endpoints
+            ), return_exceptions=True)
+            
+            for endpoint, response in zip(endpoints, responses):
+                if isinstance(response, requests.exceptions.RequestException):
+                    logger.error("Telemetr.io request failed: %s", response)
+                    continue
+                if isinstance(response, Exception):
+                    raise response
+                
+                if response.status_code == 200:
+                    try:
+                        data = json_loads(response.content)
+                    except ValueError as e:
+                        # orjson and json decode errors are both ValueErrors; keep the other endpoint's data
+                        logger.error("Telemetr.io %s returned invalid JSON: %s", endpoint.split('/')[-1], e)
                         continue
-                    else:
-                        logger.warning(f"Telemetr.io {endpoint.split('/')[-1]} returned {response.status_code}")
-                        
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"Telemetr.io request failed: {e}")
+                    combined_data.update(data)
+                    logger.info("Telemetr.io %s success for @%s", endpoint.split('/')[-1], username)
+                elif response.status_code == 404:
+                    logger.warning("Channel @%s not in Telemetr.io account", username)
                     continue
+                else:
+                    logger.warning("Telemetr.io %s returned %s", endpoint.split('/')[-1], response.status_code)
             
             return combined_data if combined_data else None
             
         except Exception as e:
-            logger.error(f"Telemetr.io integration error: {e}")
+            logger.error("Telemetr.io integration error: %s", e)
             return None
 
-    def _process_telemetrio_data(self, username: str, data: Dict) -> ChannelMetrics:
+    def _process_telemetrio_data(self, username: str, data: Dict, now: Optional[datetime] = None) -> ChannelMetrics:
         """Convert Telemetr.io data to ChannelMetrics"""
         title = data.get('title', data.get('name', username))
         subscribers = self._extract_subscribers(data)
@@ -607,7 +962,7 @@ class ChannelAnalyzer:
         is_verified = data.get('verified', data.get('is_verified', False))
         description = data.get('description', data.get('about', ''))
         recent_posts = data.get('posts_last_week', data.get('recent_posts', 0))
-        last_post_date = self._parse_last_post_date(data)
+        last_post_date = self._parse_last_post_date(data, now)
         niche = self._classify_niche(title, description)
         content_quality = self._assess_telemetrio_quality(data)
         
@@ -632,7 +987,7 @@ class ChannelAnalyzer:
             posts_per_day=0.0
         )
 
-    def _process_harvester_data(self, data: Dict) -> ChannelMetrics:
+    def _process_harvester_data(self, data: Dict, now: Optional[datetime] = None) -> ChannelMetrics:
         """Convert Harvester data to ChannelMetrics with real Bot API verification"""
         engagement_rate = 0.0
         if data.get('subs', 0) and data.get('avg_views', 0):
@@ -658,7 +1013,7 @@ class ChannelAnalyzer:
             recent_posts=int(data.get('posts_per_day', 0)),
             avg_views=float(data.get('avg_views', 0)),
             engagement_rate=round(engagement_rate, 2),
-            last_post_date=datetime.now() - timedelta(days=1),
+            last_post_date=(now or datetime.now()) - timedelta(days=1),
             niche=niche,
             has_profile_photo=True,
             content_quality_score=content_quality,
@@ -670,30 +1025,21 @@ class ChannelAnalyzer:
 
     def _extract_subscribers(self, data: Dict) -> int:
         """Extract subscriber count from various API formats"""
-        subscriber_fields = [
-            'participants_count', 'subscribers_count', 'member_count', 
-            'subscribers', 'members', 'participants', 'count', 'subs',
-            'participantsCount', 'subscribersCount', 'memberCount'
-        ]
-        
-        for field in subscriber_fields:
-            if field in data:
-                try:
-                    value = data[field]
-                    if isinstance(value, (int, float)):
-                        return int(value)
-                    elif isinstance(value, str):
-                        clean_value = value.replace(',', '').replace(' ', '').replace('.', '')
-                        return int(clean_value)
-                except (ValueError, TypeError):
-                    continue
-        
-        if 'stats' in data and isinstance(data['stats'], dict):
-            return self._extract_subscribers(data['stats'])
+        for field in self.SUBSCRIBER_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            try:
+                if isinstance(value, str):
+                    value = value.replace(',', '').replace(' ', '').replace('.', '')
+                return int(value)
+            except (ValueError, TypeError):
+                continue
         
-        return 0
+        stats = data.get('stats')
+        return self._extract_subscribers(stats) if isinstance(stats, dict) else 0
 
-    def _parse_last_post_date(self, data: Dict) -> datetime:
+    def _parse_last_post_date(self, data: Dict, now: Optional[datetime] = None) -> datetime:
         """Parse last post date from various formats"""
         date_fields = ['last_post', 'lastPost', 'last_activity', 'updated_at']
         
@@ -702,15 +1048,20 @@ class ChannelAnalyzer:
                 try:
                     date_str = data[field]
                     if isinstance(date_str, str):
-                        for fmt in ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S']:
+                        try:
+                            return parse_iso_datetime(date_str).replace(tzinfo=None)
+                        except ValueError:
+                            pass
+                        # Slow path for strings fromisoformat rejects (e.g. trailing text)
+                        for fmt, length in (('%Y-%m-%dT%H:%M:%S', 19), ('%Y-%m-%d %H:%M:%S', 19), ('%Y-%m-%d', 10)):
                             try:
-                                return datetime.strptime(date_str[:len(fmt)], fmt)
+                                return datetime.strptime(date_str[:length], fmt)
                             except ValueError:
                                 continue
                 except Exception:
                     continue
         
-        return datetime.now() - timedelta(days=1)
+        return (now or datetime.now()) - timedelta(days=1)
 
     def _assess_telemetrio_quality(self, data: Dict) -> float:
         """Assess content quality from Telemetr.io metrics"""
@@ -779,29 +1130,14 @@ class ChannelAnalyzer:
 
     def _classify_niche(self, title: str, description: str) -> ChannelNiche:
         """Classify channel niche based on content"""
-        text = (title + ' ' + description).lower()
-        keywords = {
-            ChannelNiche.CRYPTO: ['crypto', 'bitcoin', 'blockchain', 'defi', 'nft', 'trading', 'altcoin'],
-            ChannelNiche.TECH: ['tech', 'technology', 'programming', 'ai', 'software', 'developer'],
-            ChannelNiche.BUSINESS: ['business', 'entrepreneur', 'startup', 'marketing', 'sales'],
-            ChannelNiche.FINANCE: ['finance', 'investment', 'stock', 'forex', 'money'],
-            ChannelNiche.NEWS: ['news', 'breaking', 'daily', 'update', 'current'],
-            ChannelNiche.GAMING: ['gaming', 'game', 'esports', 'gamer'],
-            ChannelNiche.EDUCATION: ['education', 'learning', 'course', 'tutorial'],
-            ChannelNiche.ENTERTAINMENT: ['entertainment', 'fun', 'meme', 'funny'],
-        }
-        
-        for niche, niche_keywords in keywords.items():
-            if any(keyword in text for keyword in niche_keywords):
-                return niche
-        return ChannelNiche.ENTERTAINMENT
+        return match_niche(title, description, NICHE_PATTERNS)
 
 # Eligibility Checker
 class EligibilityChecker:
     def __init__(self, config: Config):
         self.config = config
 
-    async def check_eligibility(self, metrics: ChannelMetrics) -> EligibilityResult:
+    async def check_eligibility(self, metrics: ChannelMetrics, now: Optional[datetime] = None) -> EligibilityResult:
         reasons = []
         warnings = []
         eligible = True
@@ -816,14 +1152,8 @@ class EligibilityChecker:
             reasons.append(f"❌ Needs {self.config.MIN_SUBSCRIBERS}+ subscribers (has {metrics.subscribers})")
 
         # Fix timezone issue for date comparison
-        now = datetime.now()
-        last_post = metrics.last_post_date
-        if last_post.tzinfo is not None:
-            last_post = last_post.replace(tzinfo=None)
-        if now.tzinfo is not None:
-            now = now.replace(tzinfo=None)
-            
-        days_since_last_post = (now - last_post).days
+        now = now or datetime.now()
+        days_since_last_post = (now - naive_datetime(metrics.last_post_date)).days
         if days_since_last_post > self.config.ACTIVITY_DAYS:
             eligible = False
             reasons.append(f"❌ No activity in last {self.config.ACTIVITY_DAYS} days")
@@ -856,6 +1186,14 @@ class EligibilityChecker:
 
 # Enhanced CPM Calculator
 class CPMCalculator:
+    # Sorted thresholds with one more value than threshold, looked up via bisect
+    ENGAGEMENT_THRESHOLDS = (10, 20, 30, 50)
+    ENGAGEMENT_MULTIPLIERS = (0.8, 0.9, 1.0, 1.15, 1.3)
+    FREQUENCY_THRESHOLDS = (0.5, 1, 2)
+    FREQUENCY_MULTIPLIERS = (0.95, 1.0, 1.05, 1.1)
+    TIER_NAME_THRESHOLDS = (10000, 50000, 100000)
+    TIER_NAMES = ("1K-10K tier", "10K-50K tier", "50K-100K tier", "100K+ tier")
+
     def __init__(self, config: Config):
         self.config = config
         self.niche_multipliers = {
@@ -869,16 +1207,20 @@ class CPMCalculator:
             ChannelNiche.ENTERTAINMENT: 0.7,
             ChannelNiche.LIFESTYLE: 0.8,
         }
+        # Tuple indexed by ChannelNiche.ordinal for the per-analysis lookups
+        self._niche_mult_table = tuple(self.niche_multipliers.get(niche, 1.0) for niche in ChannelNiche)
         self.subscriber_tiers = [
             (1000, 0.15),
             (10000, 0.25),
             (50000, 0.45),
             (100000, 0.75),
         ]
+        self._tier_thresholds = [threshold for threshold, _ in self.subscriber_tiers]
+        self._tier_cpms = [cpm for _, cpm in self.subscriber_tiers]
 
     async def calculate_cpm(self, metrics: ChannelMetrics, eligibility: EligibilityResult) -> CPMRecommendation:
         base_cpm = self._get_base_cpm(metrics.subscribers)
-        niche_multiplier = self.niche_multipliers.get(metrics.niche, 1.0)
+        niche_multiplier = self._niche_mult_table[metrics.niche.ordinal]
         engagement_multiplier = self._get_engagement_multiplier(metrics.engagement_rate)
         quality_multiplier = 0.8 + (metrics.content_quality_score * 0.4)
         verification_multiplier = 1.1 if metrics.is_verified else 1.0
@@ -932,32 +1274,16 @@ class CPMCalculator:
         if posts_per_day == 0:
             return 1.0  # No penalty if data not available
         
-        if posts_per_day >= 2:
-            return 1.1  # Very active
-        elif posts_per_day >= 1:
-            return 1.05  # Active
-        elif posts_per_day >= 0.5:
-            return 1.0  # Regular
-        else:
-            return 0.95  # Inactive
+        # Inactive (<0.5), Regular (0.5+), Active (1+), Very active (2+)
+        return self.FREQUENCY_MULTIPLIERS[bisect.bisect_right(self.FREQUENCY_THRESHOLDS, posts_per_day)]
 
     def _get_base_cpm(self, subscribers: int) -> float:
-        for threshold, cpm in reversed(self.subscriber_tiers):
-            if subscribers >= threshold:
-                return cpm
-        return self.subscriber_tiers[0][1]
+        # Channels below the first threshold are priced at the lowest tier
+        i = bisect.bisect_right(self._tier_thresholds, subscribers) - 1
+        return self._tier_cpms[max(i, 0)]
 
     def _get_engagement_multiplier(self, engagement_rate: float) -> float:
-        if engagement_rate >= 50:
-            return 1.3
-        elif engagement_rate >= 30:
-            return 1.15
-        elif engagement_rate >= 20:
-            return 1.0
-        elif engagement_rate >= 10:
-            return 0.9
-        else:
-            return 0.8
+        return self.ENGAGEMENT_MULTIPLIERS[bisect.bisect_right(self.ENGAGEMENT_THRESHOLDS, engagement_rate)]
 
     def _generate_reasoning(self, metrics: ChannelMetrics, base_cpm: float, multiplier: float) -> str:
         factors = []
@@ -969,7 +1295,7 @@ class CPMCalculator:
         elif metrics.engagement_rate < 20:
             factors.append(f"Low engagement ({int((1 - self._get_engagement_multiplier(metrics.engagement_rate)) * 100)}% discount)")
         
-        niche_mult = self.niche_multipliers.get(metrics.niche, 1.0)
+        niche_mult = self._niche_mult_table[metrics.niche.ordinal]
         if niche_mult > 1.0:
             factors.append(f"{metrics.niche.value.title()} niche premium (+{int((niche_mult - 1) * 100)}%)")
         elif niche_mult < 1.0:
@@ -993,14 +1319,7 @@ class CPMCalculator:
         return " • ".join(factors)
 
     def _get_tier_name(self, subscribers: int) -> str:
-        if subscribers >= 100000:
-            return "100K+ tier"
-        elif subscribers >= 50000:
-            return "50K-100K tier"
-        elif subscribers >= 10000:
-            return "10K-50K tier"
-        else:
-            return "1K-10K tier"
+        return self.TIER_NAMES[bisect.bisect_right(self.TIER_NAME_THRESHOLDS, subscribers)]
 
     def _assess_market_position(self, metrics: ChannelMetrics) -> str:
         if metrics.engagement_rate >= 40 and metrics.subscribers >= 50000:
@@ -1014,35 +1333,52 @@ class CPMCalculator:
 
 # Market Data Collector
 class MarketDataCollector:
+    PRICE_TTL = 300  # 5 minutes
+
     def __init__(self):
         self.ton_price_url = "https://api.coingecko.com/api/v3/simple/price?ids=the-open-network&vs_currencies=usd"
+        self._cached_price = None
+        self._cached_at = 0.0
+        self._refresh = None  # in-flight CoinGecko fetch shared by concurrent callers
+        # Reuse the CoinGecko connection (and its TLS session) across refreshes
+        self.http = create_http_session()
+
+    def _cached_ton_price(self) -> Optional[float]:
+        if self._cached_price is not None and time.monotonic() - self._cached_at < self.PRICE_TTL:
+            return self._cached_price
+        return None
 
     async def get_ton_price(self) -> float:
+        """Get the TON/USD price, refreshing it from CoinGecko at most every PRICE_TTL seconds"""
+        price = self._cached_ton_price()
+        if price is not None:
+            return price
+        # Concurrent callers await the same fetch on the loop, so only one executor thread is used
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._refresh_ton_price())
+        return await asyncio.shield(self._refresh)
+
+    async def _refresh_ton_price(self) -> float:
         try:
-            response = requests.get(self.ton_price_url, timeout=10)
-            data = response.json()
-            return data['the-open-network']['usd']
-        except Exception as e:
-            logger.error(f"Failed to get TON price: {e}")
-            return 5.0
+            return await run_blocking(self._fetch_ton_price)
+        finally:
+            self._refresh = None
 
-# Main Bot Class
-class CPMRecommendationBot:
-    def __init__(self, config: Config):
-        self.config = config
-        self.bot = telebot.TeleBot(config.BOT_TOKEN)
-        self.firebase_manager = FirebaseManager(config.FIREBASE_CREDENTIALS_PATH)
-        self.channel_analyzer = ChannelAnalyzer(config)
-        self.eligibility_checker = EligibilityChecker(config)
-        self.cpm_calculator = CPMCalculator(config)
-        self.market_collector = MarketDataCollector()
-        self._last_requests = {}
-        self.setup_handlers()
+    def _fetch_ton_price(self) -> float:
+        try:
+            response = self.http.get(self.ton_price_url, timeout=10)
+            data = json_loads(response.content)
+            price = data['the-open-network']['usd']
+        except Exception as e:
+            logger.error("Failed to get TON price: %s", e)
+            # Prefer the last known price over the static fallback
+            return self._cached_price if self._cached_price is not None else 5.0
+        self._cached_price = price
+        self._cached_at = time.monotonic()
+        return price
 
-    def setup_handlers(self):
-        @self.bot.message_handler(commands=['start'])
-        def start_command(message):
-            welcome_text = """🎯 *Telegram Ads Helper* - Enhanced CPM Analysis Expert
+# Static bot replies, built once at import
+START_TEXT = """🎯 *Telegram Ads Helper* - Enhanced CPM Analysis Expert
 
 I analyze Telegram channels with comprehensive data sources and provide optimal CPM recommendations.
 
@@ -1061,11 +1397,8 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
 
 *Try it now:*
 `/analyze @channelname` - See comprehensive analysis with real verification data!"""
-            self.bot.reply_to(message, welcome_text, parse_mode='Markdown')
 
-        @self.bot.message_handler(commands=['help'])
-        def help_command(message):
-            help_text = """🔍 *Enhanced CPM Recommendation Bot Guide*
+HELP_TEXT = """🔍 *Enhanced CPM Recommendation Bot Guide*
 
 *Channel Analysis Features:*
 • **Multi-source data**: Telemetr.io + Harvester + Bot API + TGStat
@@ -1101,67 +1434,208 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
 • Look for regular posting schedules (0.5+ posts/day)
 • Consider interaction metrics for audience quality
 • Build relationships before placing ads"""
-            self.bot.reply_to(message, help_text, parse_mode='Markdown')
+
+FIND_USAGE_TEXT = (
+    "🔍 *Enhanced Channel Discovery*\n\nUsage: `/find <niche>`\n\nAvailable niches:\n• "
+    + "\n• ".join(niche.value for niche in ChannelNiche)
+    + "\n\n*Example:* `/find crypto`"
+)
+
+# Filled per request with str.format_map
+FIND_TEMPLATE = """🔍 *Find {niche_title} Channels - Enhanced Strategy*
+
+*Quality Indicators to Look For:*
+• 📊 **High engagement**: 20%+ average views/subscribers
+• ⏰ **Regular posting**: 0.5+ posts per day
+• 💬 **Active community**: Comments, reactions, forwards
+• 📱 **Rich media**: Photos, videos, voice messages
+• ✅ **Complete profiles**: Description, photo, verification
+
+*Search Strategy:*
+1. **Telegram Search**: `{niche}` + "channel", "news", "updates"
+2. **Hebrew Keywords**: `{niche} עברית`, `{niche} ישראל` 
+3. **Related Terms**: Look for channels in related topics
+
+*Analysis Workflow:*
+1. Find potential channels manually
+2. Use `/analyze @channel` for comprehensive metrics
+3. Look for channels with:
+   - 1000+ subscribers
+   - 15%+ engagement rate
+   - Regular posting schedule
+   - Good interaction metrics
+
+*Pro Tips:*
+• Target 10-20 channels in your niche
+• Build relationships before advertising
+• Monitor competitor ad placements
+• Test different CPM levels
+• Consider direct partnerships for premium channels
+
+*Quality Benchmarks:*
+• **Premium**: 30%+ engagement, daily posts, high interactions
+• **Good**: 20%+ engagement, 3+ posts/week, some interactions  
+• **Average**: 10%+ engagement, weekly posts, basic metrics"""
+
+MARKET_TEMPLATE = """📊 *Enhanced Market Analysis - {niche_title} Niche*
+
+💰 *Current TON Price:* ${ton_price}
+
+📈 *Base CPM Tiers (TON):*
+• **1K-10K subscribers**: 0.15-0.25 TON (${usd_015}-${usd_025})
+• **10K-50K subscribers**: 0.25-0.45 TON (${usd_025}-${usd_045})
+• **50K-100K subscribers**: 0.45-0.75 TON (${usd_045}-${usd_075})
+• **100K+ subscribers**: 0.75+ TON (${usd_075}+)
+
+🎯 *{niche_title} Niche Multiplier:* {multiplier}x
+• **Adjusted ranges**: {adjusted_low}-{adjusted_high} TON
+
+🔥 *Quality Premiums:*
+• **High engagement** (30%+): +15% CPM
+• **Daily posting**: +10% CPM
+• **Rich interactions**: +10% CPM
+• **Verified channels**: +10% CPM
+• **Premium content**: +20% CPM
+
+⚠️ *Market Realities:*
+• Channel owner must manually enable ads
+• Advertisers select channels manually
+• Success depends on relationship building
+• Quality content increases acceptance rates
+
+*Bidding Strategy:*
+• **Conservative**: Base rate × 0.8 (higher acceptance)
+• **Competitive**: Base rate × 1.0 (balanced approach)
+• **Aggressive**: Base rate × 1.3 (premium placement)
+
+*Success Metrics:*
+• Aim for 15%+ acceptance rate
+• Monitor cost per actual impression
+• Track conversion rates from ads
+• Build long-term channel relationships"""
+
+ELIGIBLE_ANALYSIS_TEMPLATE = """
+💰 *CPM Recommendations:*
+• **Conservative**: {conservative} TON (${conservative_usd:.2f})
+• **Competitive**: {competitive} TON (${competitive_usd:.2f}) ⭐ *Recommended*
+• **Aggressive**: {aggressive} TON (${aggressive_usd:.2f})
+
+🧠 *Pricing Factors:*
+{reasoning}
+
+📈 *Market Position:*
+{market_position}
+
+🎯 *Success Probability:* {success_pct:.0f}%
+
+💡 *Strategic Recommendations:*
+• Start with competitive rate for optimal balance
+• Monitor acceptance within 48-72 hours
+• Consider direct outreach to channel owner
+• Track performance vs other channels in niche
+• Build relationship for future campaigns
+
+📋 *How Telegram Ads Work:*
+• Channel owners must manually enable monetization
+• Advertisers manually select specific channels for ads
+• Not all eligible channels show ads (owner choice)"""
+
+INELIGIBLE_ANALYSIS_TEMPLATE = """
+❌ *Not Ready for Telegram Ads*
+
+Focus on channels that meet these criteria:
+• ✅ 1000+ subscribers
+• ✅ Public and actively posting
+• ✅ 15%+ engagement rate
+• ✅ Complete channel profile
+• ✅ Regular posting schedule
+
+🔍 *Try analyzing established channels in {niche} niche*
+*Look for channels with verified status and daily activity*"""
+
+# Main Bot Class
+class CPMRecommendationBot:
+    RATE_LIMIT_SECONDS = 60
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.bot = telebot.TeleBot(config.BOT_TOKEN)
+        self.firebase_manager = FirebaseManager(config.FIREBASE_CREDENTIALS_PATH)
+        self.channel_analyzer = ChannelAnalyzer(config)
+        self.eligibility_checker = EligibilityChecker(config)
+        self.cpm_calculator = CPMCalculator(config)
+        self.market_collector = MarketDataCollector()
+        # Per-user last /analyze time; entries expire with the rate-limit window
+        self._last_requests = TTLCache(maxsize=10000, ttl=self.RATE_LIMIT_SECONDS)
+        
+        # One long-lived event loop serves every command, so HTTP sessions,
+        # caches and in-flight lookups are shared across requests
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='cpm-bot-loop', daemon=True).start()
+        self.setup_handlers()
+
+    def run_async(self, coro):
+        """Schedule a command coroutine on the bot's event loop without waiting for it"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        future.add_done_callback(self._log_command_failure)
+        return future
+
+    @staticmethod
+    def _log_command_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.error("Command failed: %s", future.exception())
+
+    def setup_handlers(self):
+        @self.bot.message_handler(commands=['start'])
+        def start_command(message):
+            self.bot.reply_to(message, START_TEXT, parse_mode='Markdown')
+
+        @self.bot.message_handler(commands=['help'])
+        def help_command(message):
+            self.bot.reply_to(message, HELP_TEXT, parse_mode='Markdown')
 
         @self.bot.message_handler(commands=['analyze'])
         def analyze_command(message):
-            def run_async():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.analyze_channel_command(message))
-                loop.close()
-            
-            thread = threading.Thread(target=run_async)
-            thread.start()
+            self.run_async(self.analyze_channel_command(message))
 
         @self.bot.message_handler(commands=['find'])
         def find_command(message):
-            def run_async():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.find_channels_command(message))
-                loop.close()
-            
-            thread = threading.Thread(target=run_async)
-            thread.start()
+            self.run_async(self.find_channels_command(message))
 
         @self.bot.message_handler(commands=['market'])
         def market_command(message):
-            def run_async():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.market_rates_command(message))
-                loop.close()
-            
-            thread = threading.Thread(target=run_async)
-            thread.start()
+            self.run_async(self.market_rates_command(message))
 
     async def analyze_channel_command(self, message):
         """Enhanced channel analysis with comprehensive metrics"""
+        price_task = None
         try:
             # Rate limiting
             user_id = message.from_user.id
             now = datetime.now()
             
-            if user_id in self._last_requests:
-                time_diff = (now - self._last_requests[user_id]).seconds
-                if time_diff < 60:
-                    self.bot.reply_to(message, 
-                        f"⏳ Please wait {60-time_diff} seconds before next analysis.")
-                    return
+            last_request = self._last_requests.get(user_id)
+            if last_request is not None:
+                time_diff = (now - last_request).seconds
+                await run_blocking(self.bot.reply_to, message,
+                    f"⏳ Please wait {max(self.RATE_LIMIT_SECONDS - time_diff, 1)} seconds before next analysis.")
+                return
             
             self._last_requests[user_id] = now
             
             # Extract channel username
-            text = message.text.split()
+            text = message.text.split(maxsplit=2)
             if len(text) < 2:
-                self.bot.reply_to(message, "❌ Please provide a channel username.\nExample: `/analyze @channelname`", parse_mode='Markdown')
+                await run_blocking(self.bot.reply_to, message, "❌ Please provide a channel username.\nExample: `/analyze @channelname`", parse_mode='Markdown')
                 return
 
             channel_username = text[1].lstrip('@')
             
+            # The TON price does not depend on the channel, so fetch it while the analysis runs
+            price_task = asyncio.create_task(self.market_collector.get_ton_price())
+            
             # Send processing message
-            processing_msg = self.bot.reply_to(message, "🔍 Analyzing channel with enhanced metrics... This may take a moment.")
+            processing_msg = await run_blocking(self.bot.reply_to, message, "🔍 Analyzing channel with enhanced metrics... This may take a moment.")
             
             # Get comprehensive channel metrics
             try:
@@ -1169,7 +1643,8 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
             except Exception as analysis_error:
                 error_msg = str(analysis_error).lower()
                 if 'flood' in error_msg or 'rate' in error_msg:
-                    self.bot.edit_message_text(
+                    await run_blocking(
+                        self.bot.edit_message_text,
                         "⚠️ Rate limit detected. Waiting to protect account integrity.\n"
                         "Try again in a few minutes.",
                         message.chat.id,
@@ -1177,8 +1652,9 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
                     )
                     return
                 else:
-                    logger.error(f"Analysis error: {analysis_error}")
-                    self.bot.edit_message_text(
+                    logger.error("Analysis error: %s", analysis_error)
+                    await run_blocking(
+                        self.bot.edit_message_text,
                         f"❌ Analysis failed: {str(analysis_error)}",
                         message.chat.id,
                         processing_msg.message_id
@@ -1186,27 +1662,31 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
                     return
             
             if not metrics:
-                self.bot.edit_message_text(
+                await run_blocking(
+                    self.bot.edit_message_text,
                     "❌ Channel not found or not accessible. Please check:\n• Channel exists and is public\n• Username is correct\n• Channel is not restricted",
                     message.chat.id,
                     processing_msg.message_id
                 )
                 return
             
+            # Read the clock again once the analysis is in: the sources stamp default
+            # post dates with their own now, so ages must be measured from after it
+            now = datetime.now()
+            
             # Check eligibility
-            eligibility = await self.eligibility_checker.check_eligibility(metrics)
+            eligibility = await self.eligibility_checker.check_eligibility(metrics, now)
             
             # Calculate enhanced CPM
             cpm_rec = await self.cpm_calculator.calculate_cpm(metrics, eligibility)
             
-            # Get TON price
-            ton_price = await self.market_collector.get_ton_price()
+            ton_price = await price_task
             
             # Generate enhanced response
-            response = self.format_enhanced_analysis_response(metrics, eligibility, cpm_rec, ton_price)
+            response = self.format_enhanced_analysis_response(metrics, eligibility, cpm_rec, ton_price, now)
             
-            # Save to database
-            await self.firebase_manager.save_channel_analysis({
+            # Save to database in the background so Firestore latency stays off the reply path
+            self.firebase_manager.queue_channel_analysis({
                 'username': metrics.username,
                 'subscribers': metrics.subscribers,
                 'niche': metrics.niche.value,
@@ -1221,117 +1701,57 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
             })
             
             # Send final response
-            self.bot.edit_message_text(response, message.chat.id, processing_msg.message_id, parse_mode='Markdown')
+            await run_blocking(self.bot.edit_message_text, response, message.chat.id, processing_msg.message_id, parse_mode='Markdown')
             
         except Exception as e:
-            logger.error(f"Error in analyze command: {e}")
-            self.bot.reply_to(message, f"❌ Analysis failed: {str(e)}")
+            logger.error("Error in analyze command: %s", e)
+            await run_blocking(self.bot.reply_to, message, f"❌ Analysis failed: {str(e)}")
+        finally:
+            # No-op once awaited; drops the pending fetch when the analysis bailed out early
+            if price_task is not None:
+                price_task.cancel()
 
     async def find_channels_command(self, message):
         """Enhanced channel discovery guidance"""
-        text = message.text.split()
+        text = message.text.split(maxsplit=2)
         if len(text) < 2:
-            niches = [niche.value for niche in ChannelNiche]
-            self.bot.reply_to(message, 
-                f"🔍 *Enhanced Channel Discovery*\n\nUsage: `/find <niche>`\n\nAvailable niches:\n• " + "\n• ".join(niches) + 
-                f"\n\n*Example:* `/find crypto`",
-                parse_mode='Markdown')
+            await run_blocking(self.bot.reply_to, message, FIND_USAGE_TEXT, parse_mode='Markdown')
             return
 
         niche = text[1].lower()
         
-        response = f"""🔍 *Find {niche.title()} Channels - Enhanced Strategy*
-
-*Quality Indicators to Look For:*
-• 📊 **High engagement**: 20%+ average views/subscribers
-• ⏰ **Regular posting**: 0.5+ posts per day
-• 💬 **Active community**: Comments, reactions, forwards
-• 📱 **Rich media**: Photos, videos, voice messages
-• ✅ **Complete profiles**: Description, photo, verification
-
-*Search Strategy:*
-1. **Telegram Search**: `{niche}` + "channel", "news", "updates"
-2. **Hebrew Keywords**: `{niche} עברית`, `{niche} ישראל` 
-3. **Related Terms**: Look for channels in related topics
-
-*Analysis Workflow:*
-1. Find potential channels manually
-2. Use `/analyze @channel` for comprehensive metrics
-3. Look for channels with:
-   - 1000+ subscribers
-   - 15%+ engagement rate
-   - Regular posting schedule
-   - Good interaction metrics
-
-*Pro Tips:*
-• Target 10-20 channels in your niche
-• Build relationships before advertising
-• Monitor competitor ad placements
-• Test different CPM levels
-• Consider direct partnerships for premium channels
-
-*Quality Benchmarks:*
-• **Premium**: 30%+ engagement, daily posts, high interactions
-• **Good**: 20%+ engagement, 3+ posts/week, some interactions  
-• **Average**: 10%+ engagement, weekly posts, basic metrics"""
+        response = FIND_TEMPLATE.format_map({'niche': niche, 'niche_title': niche.title()})
         
-        self.bot.reply_to(message, response, parse_mode='Markdown')
+        await run_blocking(self.bot.reply_to, message, response, parse_mode='Markdown')
 
     async def market_rates_command(self, message):
         """Enhanced market rates with comprehensive data"""
-        text = message.text.split()
+        text = message.text.split(maxsplit=2)
         niche = text[1].lower() if len(text) > 1 else 'general'
         
         ton_price = await self.market_collector.get_ton_price()
         
-        niche_enum = None
-        for n in ChannelNiche:
-            if n.value == niche:
-                niche_enum = n
-                break
+        niche_enum = NICHE_BY_VALUE.get(niche)
         
         multiplier = self.cpm_calculator.niche_multipliers.get(niche_enum, 1.0) if niche_enum else 1.0
         
-        response = f"""📊 *Enhanced Market Analysis - {niche.title()} Niche*
-
-💰 *Current TON Price:* ${ton_price:.2f}
-
-📈 *Base CPM Tiers (TON):*
-• **1K-10K subscribers**: 0.15-0.25 TON (${0.15*ton_price:.2f}-${0.25*ton_price:.2f})
-• **10K-50K subscribers**: 0.25-0.45 TON (${0.25*ton_price:.2f}-${0.45*ton_price:.2f})
-• **50K-100K subscribers**: 0.45-0.75 TON (${0.45*ton_price:.2f}-${0.75*ton_price:.2f})
-• **100K+ subscribers**: 0.75+ TON (${0.75*ton_price:.2f}+)
-
-🎯 *{niche.title()} Niche Multiplier:* {multiplier:.1f}x
-• **Adjusted ranges**: {0.15*multiplier:.2f}-{0.75*multiplier:.2f} TON
-
-🔥 *Quality Premiums:*
-• **High engagement** (30%+): +15% CPM
-• **Daily posting**: +10% CPM
-• **Rich interactions**: +10% CPM
-• **Verified channels**: +10% CPM
-• **Premium content**: +20% CPM
-
-⚠️ *Market Realities:*
-• Channel owner must manually enable ads
-• Advertisers select channels manually
-• Success depends on relationship building
-• Quality content increases acceptance rates
-
-*Bidding Strategy:*
-• **Conservative**: Base rate × 0.8 (higher acceptance)
-• **Competitive**: Base rate × 1.0 (balanced approach)
-• **Aggressive**: Base rate × 1.3 (premium placement)
-
-*Success Metrics:*
-• Aim for 15%+ acceptance rate
-• Monitor cost per actual impression
-• Track conversion rates from ads
-• Build long-term channel relationships"""
-        
-        self.bot.reply_to(message, response, parse_mode='Markdown')
-
-    def format_enhanced_analysis_response(self, metrics: ChannelMetrics, eligibility: EligibilityResult, cpm_rec: CPMRecommendation, ton_price: float) -> str:
+        # Every figure is formatted exactly once, then dropped into the shared template
+        response = MARKET_TEMPLATE.format_map({
+            'niche_title': niche.title(),
+            'ton_price': f"{ton_price:.2f}",
+            'usd_015': f"{0.15 * ton_price:.2f}",
+            'usd_025': f"{0.25 * ton_price:.2f}",
+            'usd_045': f"{0.45 * ton_price:.2f}",
+            'usd_075': f"{0.75 * ton_price:.2f}",
+            'multiplier': f"{multiplier:.1f}",
+            'adjusted_low': f"{0.15 * multiplier:.2f}",
+            'adjusted_high': f"{0.75 * multiplier:.2f}",
+        })
+        
+        await run_blocking(self.bot.reply_to, message, response, parse_mode='Markdown')
+
+    def format_enhanced_analysis_response(self, metrics: ChannelMetrics, eligibility: EligibilityResult, cpm_rec: CPMRecommendation, ton_price: float,
+                                          now: Optional[datetime] = None) -> str:
         """Format comprehensive analysis with enhanced metrics"""
         
         status_icon = "✅" if eligibility.eligible else "❌"
@@ -1363,7 +1783,7 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
         competitive_usd = cpm_rec.competitive * ton_price
         aggressive_usd = cpm_rec.aggressive * ton_price
 
-        response = f"""🎯 *Enhanced CPM Analysis: @{metrics.username}*
+        header = f"""🎯 *Enhanced CPM Analysis: @{metrics.username}*
 
 {status_icon} *Eligibility:* {"ELIGIBLE" if eligibility.eligible else "NOT ELIGIBLE"}
 
@@ -1380,71 +1800,36 @@ I analyze Telegram channels with comprehensive data sources and provide optimal
 • **Media Content**: {metrics.media_ratio*100:.0f}% visual posts
 • **Community Interaction**: {metrics.total_reactions:,} reactions
 • **Viral Content**: {metrics.total_forwards:,} forwards
-• **Last Post**: {self.format_time_ago(metrics.last_post_date)}
+• **Last Post**: {self.format_time_ago(metrics.last_post_date, now)}
 
 🎯 *Eligibility Assessment:*"""
         
-        for reason in eligibility.reasons[:3]:
-            response += f"  {reason}\n"
-        
+        # Lines are collected and joined once rather than grown with repeated +=
+        parts = [header]
+        parts.extend(f"  {reason}" for reason in eligibility.reasons[:3])
         if eligibility.warnings:
-            response += "\n⚠️ *Key Considerations:*\n"
-            for warning in eligibility.warnings[:3]:
-                response += f"  {warning}\n"
-
-        if eligibility.eligible:
-            response += f"""
-💰 *CPM Recommendations:*
-• **Conservative**: {cmp_rec.conservative} TON (${conservative_usd:.2f})
-• **Competitive**: {cpm_rec.competitive} TON (${competitive_usd:.2f}) ⭐ *Recommended*
-• **Aggressive**: {cpm_rec.aggressive} TON (${aggressive_usd:.2f})
-
-🧠 *Pricing Factors:*
-{cpm_rec.reasoning}
-
-📈 *Market Position:*
-{cpm_rec.market_position}
-
-🎯 *Success Probability:* {cpm_rec.success_probability*100:.0f}%
-
-💡 *Strategic Recommendations:*
-• Start with competitive rate for optimal balance
-• Monitor acceptance within 48-72 hours
-• Consider direct outreach to channel owner
-• Track performance vs other channels in niche
-• Build relationship for future campaigns
-
-📋 *How Telegram Ads Work:*
-• Channel owners must manually enable monetization
-• Advertisers manually select specific channels for ads
-• Not all eligible channels show ads (owner choice)"""
-        else:
-            response += f"""
-❌ *Not Ready for Telegram Ads*
-
-Focus on channels that meet these criteria:
-• ✅ 1000+ subscribers
-• ✅ Public and actively posting
-• ✅ 15%+ engagement rate
-• ✅ Complete channel profile
-• ✅ Regular posting schedule
-
-🔍 *Try analyzing established channels in {metrics.niche.value} niche*
-*Look for channels with verified status and daily activity*"""
-
-        return response
-
-    def format_time_ago(self, date: datetime) -> str:
+            parts.append("\n⚠️ *Key Considerations:*")
+            parts.extend(f"  {warning}" for warning in eligibility.warnings[:3])
+
+        template = ELIGIBLE_ANALYSIS_TEMPLATE if eligibility.eligible else INELIGIBLE_ANALYSIS_TEMPLATE
+        parts.append(template.format_map({
+            'conservative': cpm_rec.conservative,
+            'competitive': cpm_rec.competitive,
+            'aggressive': cpm_rec.aggressive,
+            'conservative_usd': conservative_usd,
+            'competitive_usd': competitive_usd,
+            'aggressive_usd': aggressive_usd,
+            'reasoning': cpm_rec.reasoning,
+            'market_position': cpm_rec.market_position,
+            'success_pct': cpm_rec.success_probability * 100,
+            'niche': metrics.niche.value,
+        }))
+
+        return "\n".join(parts)
+
+    def format_time_ago(self, date: datetime, now: Optional[datetime] = None) -> str:
         """Format time ago string"""
-        now = datetime.now()
-        
-        # Make both datetimes timezone-naive for comparison
-        if date.tzinfo is not None:
-            date = date.replace(tzinfo=None)
-        if now.tzinfo is not None:
-            now = now.replace(tzinfo=None)
-            
-        delta = now - date
+        delta = (now or datetime.now()) - naive_datetime(date)
         
         if delta.days > 7:
             return f"{delta.days} days ago"
@@ -1464,23 +1849,62 @@ Focus on channels that meet these criteria:
         logger.info("🔍 Enhanced metrics: Real verification, engagement, interactions, content quality")
         logger.info("🔄 Press Ctrl+C to stop the bot")
         
+        # Other failures propagate so cli() can report them and exit non-zero
         try:
             self.bot.remove_webhook()
             self.bot.infinity_polling(timeout=10, long_polling_timeout=5, none_stop=True)
         except KeyboardInterrupt:
             logger.info("👋 Bot stopped by user")
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Write out analyses still queued for Firestore before the daemon loop thread dies"""
+        future = asyncio.run_coroutine_threadsafe(self.firebase_manager.close(), self._loop)
+        try:
+            future.result(timeout)
         except Exception as e:
-            logger.error(f"❌ Bot polling error: {e}")
+            dropped = self.firebase_manager.pending_count()
+            logger.error("Firestore flush on shutdown failed, %s queued analyses dropped: %s", dropped, e)
 
 # Initialize and start
-def main():
-    print("🎯 Enhanced Telegram CPM Recommendation Bot")
-    print("=" * 60)
-    print("📊 Multi-source analysis with Harvester + Bot API + TGStat integration")
-    print("🔍 Advanced engagement and interaction metrics")
-    print("✅ Real verification status from Bot API")
-    print("📈 TGStat.ru for comprehensive channel coverage")
-    print()
+STARTUP_BANNER = """🎯 Enhanced Telegram CPM Recommendation Bot
+""" + "=" * 60 + """
+📊 Multi-source analysis with Harvester + Bot API + TGStat integration
+🔍 Advanced engagement and interaction metrics
+✅ Real verification status from Bot API
+📈 TGStat.ru for comprehensive channel coverage
+"""
+
+# Data source label and the Config settings it needs, in display order
+DATA_SOURCES = (
+    ("Telemetr.io", ('TELEMETRIO_API_KEY',)),
+    ("Harvester", ('HARVESTER_API_ID', 'HARVESTER_API_HASH')),
+    ("Bot API", ('BOT_TOKEN',)),
+    ("TGStat", ('TGSTAT_API_TOKEN',)),
+)
+
+# Expected startup failures, logged with their traceback before exiting with status 1;
+# anything else propagates (requests.RequestException is an OSError)
+STARTUP_ERRORS = (ValueError, OSError, RuntimeError, telebot.apihelper.ApiException)
+
+BOT_TOKEN_PATTERN = re.compile(r'\d+:[\w-]+')
+
+def preflight(cfg: Dict, firebase_ok: bool) -> List[str]:
+    """Cheap checks on the snapshotted settings; returns a list of problems, empty if none"""
+    errors = []
+    if not BOT_TOKEN_PATTERN.fullmatch(cfg['BOT_TOKEN']):
+        errors.append("BOT_TOKEN should look like 123456789:ABC-DEF... (copy it from @BotFather)")
+    if firebase_ok and not os.access(cfg['FIREBASE_CREDENTIALS_PATH'], os.R_OK):
+        errors.append(f"Firebase credentials at {cfg['FIREBASE_CREDENTIALS_PATH']} are not readable")
+    return errors
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    """Console entry point: run the bot and return the process exit status"""
+    argparse.ArgumentParser(description="Telegram Ads CPM recommendation bot").parse_args(argv)
+    
+    # Startup output is collected and written in one call
+    lines = [STARTUP_BANNER]
     
     # Load configuration
     config = Config()
@@ -1489,55 +1913,78 @@ def main():
     missing_creds = config.validate()
     
     if missing_creds:
-        print("❌ Missing required credentials in .env file:")
-        for cred in missing_creds:
-            print(f"   • {cred}")
-        print()
-        print("🔧 Please add these to your .env file:")
+        lines.append("❌ Missing required credentials in .env file:")
+        lines.extend(f"   • {cred}" for cred in missing_creds)
+        lines.append("")
+        lines.append("🔧 Please add these to your .env file:")
         if "BOT_TOKEN" in missing_creds:
-            print("   BOT_TOKEN=your_bot_token_from_botfather")
+            lines.append("   BOT_TOKEN=your_bot_token_from_botfather")
         if "TG_API_ID" in missing_creds or "TG_API_HASH" in missing_creds:
-            print("   TG_API_ID=your_id_from_harvester")
-            print("   TG_API_HASH=your_hash_from_harvester")
-        print()
-        print("💡 Get credentials from @BotFather for BOT_TOKEN")
-        print("💡 Copy TG_API_ID and TG_API_HASH from your existing harvester setup")
-        return
+            lines.append("   TG_API_ID=your_id_from_harvester")
+            lines.append("   TG_API_HASH=your_hash_from_harvester")
+        lines.append("")
+        lines.append("💡 Get credentials from @BotFather for BOT_TOKEN")
+        lines.append("💡 Copy TG_API_ID and TG_API_HASH from your existing harvester setup")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        return 1
+    
+    # Snapshot the settings consulted below so each is read once
+    cfg = {name: getattr(config, name) for name in (
+        'TELEMETRIO_API_KEY', 'HARVESTER_API_ID', 'HARVESTER_API_HASH',
+        'BOT_TOKEN', 'TGSTAT_API_TOKEN', 'FIREBASE_CREDENTIALS_PATH',
+    )}
     
     # Check data sources
-    data_sources = []
-    if config.TELEMETRIO_API_KEY:
-        data_sources.append("Telemetr.io")
-    if config.HARVESTER_API_ID and config.HARVESTER_API_HASH:
-        data_sources.append("Harvester")
-    if config.BOT_TOKEN:
-        data_sources.append("Bot API")
-    if config.TGSTAT_API_TOKEN:
-        data_sources.append("TGStat")
+    data_sources = [name for name, settings in DATA_SOURCES if all(cfg[setting] for setting in settings)]
     
     if not data_sources:
-        print("⚠️ No data sources configured. Bot will have limited functionality.")
-        print("💡 Add API keys to .env file for full functionality")
+        lines.append("⚠️ No data sources configured. Bot will have limited functionality.")
+        lines.append("💡 Add API keys to .env file for full functionality")
     else:
-        print(f"✅ Data sources: {', '.join(data_sources)}")
+        lines.append(f"✅ Data sources: {', '.join(data_sources)}")
     
-    # Check Firebase
-    if not os.path.exists(config.FIREBASE_CREDENTIALS_PATH):
-        print(f"⚠️ Firebase credentials not found - running without data persistence")
+    # Check Firebase with a single stat() call, keeping the reason it failed
+    firebase_problem = firebase_credentials_problem(cfg['FIREBASE_CREDENTIALS_PATH'])
+    firebase_ok = firebase_problem is None
+    if firebase_ok:
+        lines.append("✅ Firebase configured for data persistence")
     else:
-        print("✅ Firebase configured for data persistence")
+        lines.append(f"⚠️ {firebase_problem} ({cfg['FIREBASE_CREDENTIALS_PATH']}) - running without data persistence")
     
-    print()
+    # Reject malformed settings before paying for the bot's construction
+    errors = preflight(cfg, firebase_ok)
+    if errors:
+        lines.append("")
+        lines.append("❌ Invalid configuration:")
+        lines.extend(f"   • {error}" for error in errors)
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        return 1
+    
+    sys.stdout.write("\n".join(lines) + "\n\n")
+    sys.stdout.flush()
     
     # Initialize and start bot
     try:
         bot_instance = CPMRecommendationBot(config)
-        print("✅ Bot initialized successfully")
+    except STARTUP_ERRORS as e:
+        print(f"❌ Failed to initialize bot: {e}")
+        logger.exception("Bot initialization error")
+        return 1
+    
+    print("✅ Bot initialized successfully")
+    try:
         bot_instance.start_polling()
-        
-    except Exception as e:
+    except STARTUP_ERRORS as e:
         print(f"❌ Failed to start bot: {e}")
-        logger.error(f"Bot startup error: {e}")
+        logger.exception("Bot polling error")
+        return 1
+    
+    return 0
+
+def main():
+    sys.exit(cli())
 
 if __name__ == "__main__":
     main()